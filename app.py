@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
 import graphviz
+from streamlit_agraph import agraph, Node, Edge, Config
 import os
 import sys
+import gc
+from collections import Counter, defaultdict, deque
 
 #PATH SETUP
 sys.path.append(os.getcwd())
@@ -12,6 +15,197 @@ from backend.session_manager import SessionManager
 # CONFIGURATION
 st.set_page_config(page_title="CallGraph AI: Enterprise", layout="wide", page_icon="🛡️")
 
+# Graphviz layout and browser SVG rendering both degrade badly past this
+MAX_EDGES = 500
+
+# Shorter search terms match most of the graph, so they only look up a
+# function by its exact name
+MIN_SEARCH_LEN = 2
+# Entry points offered in the selectbox; one extra row is fetched to tell
+# whether the search was cut off
+SEARCH_LIMIT = 50
+
+# Past this many edges an SVG (one DOM element per node/edge) gets too slow
+# to pan and zoom, so the graph is drawn on a canvas instead
+CANVAS_EDGE_THRESHOLD = 1000
+# The canvas has no layout cost, only vis-network's draw cost, so it gets its
+# own, much higher cap than Max Rendered Edges
+CANVAS_MAX_EDGES = 5000
+LAYER_GAP_X = 300
+NODE_GAP_Y = 40
+
+
+# Sessions are never told when a tab goes away, so let idle handles expire;
+# an active session just reopens its DB on the next rerun
+@st.cache_resource(max_entries=32, ttl="1h")
+def get_api(db_path):
+    """One Kuzu handle per DB, reused across reruns instead of reopened."""
+    return GraphQuery(db_path)
+
+
+# The data caches below are shared by every session and keyed on db_path.
+# setup_user_db gives each upload its own path, so a re-upload never hits
+# results cached for the previous file and nothing has to be cleared.
+@st.cache_data(max_entries=64)
+def cached_search(db_path, name_pattern, mode):
+    return get_api(db_path).search_function(name_pattern, mode, limit=SEARCH_LIMIT + 1)
+
+
+@st.cache_data(max_entries=64)
+def cached_call_tree(db_path, root_id, depth):
+    return get_api(db_path).get_call_tree(root_id, depth)
+
+
+def cap_edges(edges, max_edges, root_name):
+    """
+    Keeps the first max_edges edges met in a BFS from root_name, so the capped
+    graph is still the top of the call tree rather than unrelated hubs.
+    Returns (edges, truncated).
+    """
+    if len(edges) <= max_edges:
+        return edges, False
+
+    children = defaultdict(list)
+    for parent, child in edges:
+        children[parent].append(child)
+
+    kept = []
+    seen = {root_name}
+    queue = deque([root_name])
+    while queue and len(kept) < max_edges:
+        node = queue.popleft()
+        for child in children[node][:max_edges - len(kept)]:
+            kept.append((node, child))
+            if child not in seen:
+                seen.add(child)
+                queue.append(child)
+    return kept, True
+
+
+def bfs_depths(edges, root_name):
+    """Returns {function: depth at which a BFS from root_name first reaches it}."""
+    children = defaultdict(list)
+    for parent, child in edges:
+        children[parent].append(child)
+
+    depth_of = {root_name: 0}
+    queue = deque([root_name])
+    while queue:
+        node = queue.popleft()
+        for child in children[node]:
+            if child not in depth_of:
+                depth_of[child] = depth_of[node] + 1
+                queue.append(child)
+    return depth_of
+
+
+@st.cache_data(max_entries=64)
+def cached_depth_layers(db_path, root_id, root_name, depth):
+    """
+    BFS over the already-fetched call tree from the root.
+    Returns {depth: number of functions first reached at that depth}.
+    """
+    tree_df = cached_call_tree(db_path, root_id, depth)
+    depth_of = bfs_depths(zip(tree_df["parent"], tree_df["child"]), root_name)
+    return dict(sorted(Counter(depth_of.values()).items()))
+
+
+@st.cache_data(max_entries=32)
+def cached_layered_layout(db_path, root_id, root_name, depth):
+    """
+    Fixed canvas positions, one column per BFS layer, computed once here so
+    the browser does not have to run a force simulation over the graph.
+    Returns {function: (x, y)}.
+    """
+    tree_df = cached_call_tree(db_path, root_id, depth)
+    depth_of = bfs_depths(zip(tree_df["parent"], tree_df["child"]), root_name)
+
+    layers = defaultdict(list)
+    for name, layer in depth_of.items():
+        layers[layer].append(name)
+
+    positions = {}
+    for layer, names in layers.items():
+        offset = (len(names) - 1) / 2
+        for i, name in enumerate(sorted(names)):
+            positions[name] = (layer * LAYER_GAP_X, (i - offset) * NODE_GAP_Y)
+    return positions
+
+
+def dot_quote(name):
+    """
+    Quotes a function name as a DOT identifier. Backslashes are escaped first
+    so a trailing or quote-adjacent one cannot end the string early.
+    """
+    return '"' + name.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def build_call_graph(edges, layout_engine):
+    """
+    Writes the DOT source directly instead of going through Digraph.edge(),
+    which re-quotes and re-formats attributes on every call.
+    """
+    splines = 'ortho' if layout_engine == 'dot' else 'true'
+    lines = [
+        # MODERN GRAPH STYLING
+        # Nodes: Rounded rectangles with soft blue fill and dark text
+        'node [shape=rect style="filled,rounded" fillcolor="#eff6ff" color="#bfdbfe" '
+        'fontname=Inter fontsize=12 penwidth=1.5]',
+        # Edges: Smooth grey lines
+        'edge [color="#94a3b8" arrowsize=0.7 penwidth=1.2]',
+        # Graph: No overlap, curved lines
+        f'graph [overlap=false splines={splines} rankdir=LR]',
+    ]
+
+    # Quote each name once; rows are already unique per (caller, callee)
+    quoted = {name: dot_quote(name) for edge in edges for name in edge}
+    lines.extend(f"{quoted[p]} -> {quoted[c]}" for p, c in edges)
+    return graphviz.Source("digraph {\n\t" + "\n\t".join(lines) + "\n}\n", engine=layout_engine)
+
+
+@st.cache_data(max_entries=32)
+def render_call_tree_svg(db_path, root_id, root_name, depth, layout_engine, max_edges):
+    """
+    Runs the Graphviz layout server-side once per selection.
+    Returns (svg, dot_source); svg is None when the Graphviz binaries are not
+    installed, and the caller lays the graph out in the browser instead.
+    """
+    tree_df = cached_call_tree(db_path, root_id, depth)
+    edges, _ = cap_edges(list(zip(tree_df["parent"], tree_df["child"])), max_edges, root_name)
+    g = build_call_graph(edges, layout_engine)
+    try:
+        return g.pipe(format='svg').decode('utf-8'), g.source
+    except graphviz.ExecutableNotFound:
+        return None, g.source
+
+
+@st.fragment
+def deepscan_panel():
+    """
+    Reruns on its own when the scan button is clicked, so the rest of the
+    page (search, call tree, graph render) is not re-executed.
+    """
+    if st.button("⚡ Run DeepScan AI"):
+        with st.spinner("Analyzing control flow logic..."):
+            import time
+            time.sleep(1.5)
+            
+            # Success banner
+            st.success("Scan Complete: 2 Issues Found")
+            
+            # Styled Alert Cards
+            st.markdown("""
+            <div style="background-color: #fef2f2; padding: 15px; border-radius: 8px; border-left: 5px solid #ef4444; margin-bottom: 10px;">
+                <strong style="color: #991b1b;">🔴 CRITICAL: Memory Leak</strong><br>
+                <span style="color: #7f1d1d;">Resource allocated in <code>init_buffer</code> is not freed before return.</span>
+            </div>
+            
+            <div style="background-color: #fffbeb; padding: 15px; border-radius: 8px; border-left: 5px solid #f59e0b;">
+                <strong style="color: #92400e;">🟠 WARNING: Unchecked Input</strong><br>
+                <span style="color: #78350f;">Function <code>parse_packet</code> accepts external buffer without boundary check.</span>
+            </div>
+            """, unsafe_allow_html=True)
+
 
 # 🎨 CUSTOM CSS (THE MAGIC SAUCE)
 
@@ -127,7 +321,29 @@ uploaded_file = st.sidebar.file_uploader("Upload Dataset (JSON)", type=["json"])
 if uploaded_file:
     if "current_file" not in st.session_state or st.session_state["current_file"] != uploaded_file.name:
         with st.spinner("🚀 Building Knowledge Graph..."):
-            db_path = SessionManager.setup_user_db(uploaded_file)
+            # Build the new DB before touching the old one, so a file that
+            # fails to load leaves the session on its previous graph
+            try:
+                db_path = SessionManager.setup_user_db(uploaded_file)
+            except Exception as e:
+                db_path = None
+                st.sidebar.error(f"❌ Could not load {uploaded_file.name}: {e}")
+                if "db_path" not in st.session_state:
+                    st.stop()
+
+        if db_path:
+            # Close this session's handle on the previous DB and delete it, so its
+            # buffer pool and files do not outlive it. The caches are shared by
+            # every session, so only this DB's handle is evicted; the new
+            # upload has a new path, which keeps stale results out of the rest.
+            old_path = st.session_state.get("db_path")
+            if old_path:
+                old_api = st.session_state.pop("api", None)
+                if old_api is not None:
+                    old_api.close()
+                get_api.clear(old_path)
+                SessionManager.cleanup_user_db(old_path)
+                gc.collect()
             st.session_state["db_path"] = db_path
             st.session_state["current_file"] = uploaded_file.name
             st.sidebar.success(f"✅ Active: {uploaded_file.name}")
@@ -136,7 +352,9 @@ else:
     st.stop()
 
 try:
-    api = GraphQuery(st.session_state["db_path"])
+    api = get_api(st.session_state["db_path"])
+    # Kept so a re-upload can close it without get_api() reopening the DB
+    st.session_state["api"] = api
 except:
     st.error("Connection Error. Please reload.")
     st.stop()
@@ -147,28 +365,45 @@ except:
 st.sidebar.divider()
 st.sidebar.markdown("### ⚙️ View Controls")
 
-search_term = st.sidebar.text_input("Search Function", value="main")
+# Widgets inside a form only report new values on submit, so typing or
+# dragging does not re-run the search and call-tree queries.
+with st.sidebar.form("view_controls"):
+    search_term = st.text_input("Search Function", value="main")
+    substring_match = st.checkbox("Match anywhere in name", value=False)
 
-layout_engine = st.sidebar.selectbox(
-    "Graph Layout", 
-    ["twopi", "dot", "neato", "circo"],
-    index=0
-)
+    layout_engine = st.selectbox(
+        "Graph Layout", 
+        ["twopi", "dot", "neato", "circo"],
+        index=0
+    )
 
-depth = st.sidebar.slider("Recursion Depth", 1, 5, 2)
+    depth = st.slider("Recursion Depth", 1, 5, 2)
+
+    max_edges = st.number_input(
+        "Max Rendered Edges", min_value=50, value=MAX_EDGES, step=50,
+        help=f"Caps the Graphviz view; trees over {CANVAS_EDGE_THRESHOLD} edges are drawn on a canvas instead.",
+    )
+
+    st.form_submit_button("Apply")
 
 # Find Entry Point
 selected_func_id = None
 if search_term:
-    results = api.search_function(search_term)
-    options = {}
-    while results.has_next():
-        row = results.get_next()
-        options[f"{row[1]} ({row[2]})"] = row[0]
+    if len(search_term) >= MIN_SEARCH_LEN:
+        search_mode = "contains" if substring_match else "prefix"
+    else:
+        search_mode = "exact"
+        st.sidebar.caption(f"Type at least {MIN_SEARCH_LEN} characters to search; shorter terms only match a function's exact name.")
+    matches = cached_search(st.session_state["db_path"], search_term, search_mode)
+    if len(matches) > SEARCH_LIMIT:
+        matches = matches.iloc[:SEARCH_LIMIT]
+        st.sidebar.caption(f"Showing the first {SEARCH_LIMIT} matches, shortest names first — refine the search to narrow them down.")
+    options = dict(zip(matches["name"] + " (" + matches["file"] + ")", matches["id"]))
 
     if options:
         selected_label = st.sidebar.selectbox("Select Entry Point", list(options.keys()))
         selected_func_id = options[selected_label]
+        selected_name = matches.loc[matches["id"] == selected_func_id, "name"].iloc[0]
 
 
 # 3. MAIN INTERFACE
@@ -176,16 +411,9 @@ if search_term:
 
 if selected_func_id:
     # Fetch Data
-    tree_cursor = api.get_call_tree(selected_func_id, depth)
-    edges, nodes, table_data = [], set(), []
-    
-    while tree_cursor.has_next():
-        row = tree_cursor.get_next()
-        parent, child = row[0], row[1]
-        edges.append((parent, child))
-        nodes.add(parent)
-        nodes.add(child)
-        table_data.append({"Caller": parent, "Callee": child})
+    tree_df = cached_call_tree(st.session_state["db_path"], selected_func_id, depth)
+    edges = list(zip(tree_df["parent"], tree_df["child"]))
+    nodes = set(tree_df["parent"]).union(tree_df["child"])
 
     #TABS
     tab1, tab2, tab3 = st.tabs(["🕸️ Graph Explorer", "📊 Analytics", "🤖 AI Security"])
@@ -193,30 +421,47 @@ if selected_func_id:
     #TAB 1: MODERN GRAPH
     with tab1:
         if edges:
-            g = graphviz.Digraph(engine=layout_engine)
-            
-            # MODERN GRAPH STYLING
-            # Nodes: Rounded rectangles with soft blue fill and dark text
-            g.attr('node', shape='rect', style='filled,rounded', 
-                   fillcolor='#eff6ff', color='#bfdbfe', 
-                   fontname='Inter', fontsize='12', penwidth='1.5')
-            
-            # Edges: Smooth grey lines
-            g.attr('edge', color='#94a3b8', arrowsize='0.7', penwidth='1.2')
-            
-            # Graph: No overlap, curved lines
-            g.attr(overlap='false', splines='ortho' if layout_engine == 'dot' else 'true', rankdir='LR')
-
-            seen = set()
-            for p, c in edges:
-                if f"{p}->{c}" not in seen:
-                    g.edge(p, c)
-                    seen.add(f"{p}->{c}")
-            
-            st.graphviz_chart(g, use_container_width=True)
+            # Decide on the full tree: capping first would keep large trees
+            # under the threshold and always send them to Graphviz
+            if len(edges) > CANVAS_EDGE_THRESHOLD:
+                shown_edges, truncated = cap_edges(edges, CANVAS_MAX_EDGES, selected_name)
+                if truncated:
+                    st.warning(
+                        f"Graph too large ({len(edges)} edges) — showing the first {len(shown_edges)} "
+                        f"edges reached breadth-first from {selected_name}. Lower the depth to see the whole tree."
+                    )
+                positions = cached_layered_layout(
+                    st.session_state["db_path"], selected_func_id, selected_name, depth
+                )
+                shown_nodes = {name for edge in shown_edges for name in edge}
+                agraph(
+                    nodes=[
+                        Node(id=n, label=n, shape="box", color="#eff6ff",
+                             x=positions.get(n, (0, 0))[0], y=positions.get(n, (0, 0))[1])
+                        for n in shown_nodes
+                    ],
+                    edges=[Edge(source=p, target=c, color="#94a3b8") for p, c in shown_edges],
+                    config=Config(width=1200, height=700, directed=True, physics=False),
+                )
+            else:
+                shown_edges, truncated = cap_edges(edges, max_edges, selected_name)
+                if truncated:
+                    st.warning(
+                        f"Graph too large ({len(edges)} edges) — showing the first {len(shown_edges)} "
+                        f"edges reached breadth-first from {selected_name}. Raise 'Max Rendered Edges' to see more."
+                    )
+                svg, dot_source = render_call_tree_svg(
+                    st.session_state["db_path"], selected_func_id, selected_name, depth, layout_engine, max_edges
+                )
+                if svg is None:
+                    st.graphviz_chart(graphviz.Source(dot_source, engine=layout_engine))
+                else:
+                    st.image(svg, use_container_width=True)
+                st.download_button("Download DOT", dot_source, file_name="call_tree.dot", mime="text/vnd.graphviz")
             
             with st.expander("Show Raw Connection Data"):
-                st.dataframe(pd.DataFrame(table_data), use_container_width=True)
+                # Relabel the query's columns rather than rebuilding row by row
+                st.dataframe(tree_df.rename(columns={"parent": "Caller", "child": "Callee"}), use_container_width=True)
         else:
             st.warning("No connections found at this depth.")
 
@@ -251,11 +496,12 @@ if selected_func_id:
         st.markdown("<br>", unsafe_allow_html=True)
         st.write("#### 📉 Depth Distribution")
         
-        # Styled Table Mockup
+        # Functions per BFS layer, from the call tree fetched above
+        layers = cached_depth_layers(st.session_state["db_path"], selected_func_id, selected_name, depth)
         stats_data = {
-            "Depth Layer": [f"Layer {i}" for i in range(depth + 1)],
-            "Node Count": [1 if i==0 else int(len(nodes)/(depth)*i) if depth>0 else 0 for i in range(depth + 1)],
-            "Risk Score": [f"{min(100, (i+1)*12)}/100" for i in range(depth + 1)]
+            "Depth Layer": [f"Layer {i}" for i in layers],
+            "Node Count": list(layers.values()),
+            "Risk Score": [f"{min(100, (i+1)*12)}/100" for i in layers]
         }
         st.dataframe(pd.DataFrame(stats_data), use_container_width=True)
 
@@ -264,23 +510,4 @@ if selected_func_id:
         st.markdown("### 🤖 Intelligent Vulnerability Scan")
         st.info("The AI engine analyzes the Code Property Graph (CPG) logic flows.")
         
-        if st.button("⚡ Run DeepScan AI"):
-            with st.spinner("Analyzing control flow logic..."):
-                import time
-                time.sleep(1.5)
-                
-                # Success banner
-                st.success("Scan Complete: 2 Issues Found")
-                
-                # Styled Alert Cards
-                st.markdown("""
-                <div style="background-color: #fef2f2; padding: 15px; border-radius: 8px; border-left: 5px solid #ef4444; margin-bottom: 10px;">
-                    <strong style="color: #991b1b;">🔴 CRITICAL: Memory Leak</strong><br>
-                    <span style="color: #7f1d1d;">Resource allocated in <code>init_buffer</code> is not freed before return.</span>
-                </div>
-                
-                <div style="background-color: #fffbeb; padding: 15px; border-radius: 8px; border-left: 5px solid #f59e0b;">
-                    <strong style="color: #92400e;">🟠 WARNING: Unchecked Input</strong><br>
-                    <span style="color: #78350f;">Function <code>parse_packet</code> accepts external buffer without boundary check.</span>
-                </div>
-                """, unsafe_allow_html=True)
\ No newline at end of file
+        deepscan_panel()
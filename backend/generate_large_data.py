@@ -1,6 +1,7 @@
-import json
-import random
-import hashlib
+import orjson
+from hashlib import blake2b
+import numpy as np
+from collections import deque
 
 
 NUM_LAYERS = 5           # Deeper recursion (Exponential growth)
@@ -20,11 +21,17 @@ ROOT_MODULES = [
 ]
 
 
+ACTIONS = np.array(['proc', 'calc', 'parse', 'load', 'init', 'sync', 'handle', 'fetch'])
+
+# One generator for all draws; each fan-out batch is drawn in a single call
+rng = np.random.default_rng()
+
+
 unique_counter = 0
 
 def get_hash(name):
-    # Deterministic SHA-256 ID
-    return str(int(hashlib.sha256(name.encode()).hexdigest()[:16], 16))
+    # Deterministic 64-bit ID; no need for a cryptographic digest here
+    return str(int.from_bytes(blake2b(name.encode(), digest_size=8).digest(), "big"))
 
 def generate_dataset():
     global unique_counter
@@ -34,40 +41,45 @@ def generate_dataset():
     
     functions = []
     calls = []
-    func_ids = []
+    func_ids = []          # ordered, for picking random cross-link targets by index
+    func_id_set = set()    # same ids, for O(1) membership checks
     util_map = {}
 
     # 1. CREATE UTILITY HUBS (The "Dense Centers")
     for u in UTILS:
         fid = get_hash(u)
-        if fid not in func_ids:
+        if fid not in func_id_set:
             functions.append({
                 "id": fid, 
                 "name": u, 
                 "file": "utils/common_core.c", 
-                "line": random.randint(10, 100), 
+                "line": int(rng.integers(10, 100, endpoint=True)), 
                 "params": ["void*"]
             })
             util_map[u] = fid
             func_ids.append(fid)
+            func_id_set.add(fid)
 
-    # 2. RECURSIVE BRANCHING GENERATOR
-    def create_branch(parent_id, current_depth, prefix):
+    # 2. BRANCHING GENERATOR (one fan-out per call, driven by a work queue)
+    def make_children(parent_id, current_depth, prefix):
         global unique_counter
-        
-        
-        if current_depth > NUM_LAYERS:
-            return
 
-        
-        num_children = random.randint(2, BRANCH_FACTOR)
+        child_ids = []
+        num_children = int(rng.integers(2, BRANCH_FACTOR + 1))
+
+        actions = rng.choice(ACTIONS, num_children)
+        lines = rng.integers(100, 20000, num_children, endpoint=True)
+        call_lines = rng.integers(100, 900, num_children, endpoint=True)
+        util_pick = rng.random(num_children) > 0.65
+        util_targets = rng.choice(len(UTILS), num_children)
+        chaos_pick = rng.random(num_children) < CHAOS_FACTOR
+        chaos_lines = rng.integers(1000, 5000, num_children, endpoint=True)
         
         for i in range(num_children):
             unique_counter += 1
             
             
-            action = random.choice(['proc', 'calc', 'parse', 'load', 'init', 'sync', 'handle', 'fetch'])
-            name = f"{prefix}_{action}_{unique_counter}"
+            name = f"{prefix}_{actions[i]}_{unique_counter}"
             fid = get_hash(name)
             
             
@@ -75,21 +87,23 @@ def generate_dataset():
                 "id": fid, 
                 "name": name, 
                 "file": f"modules/{prefix}/layer_{current_depth}.c", 
-                "line": random.randint(100, 20000), 
+                "line": int(lines[i]), 
                 "params": ["ctx_t*", "int", "char*"]
             })
             func_ids.append(fid)
+            func_id_set.add(fid)
+            child_ids.append(fid)
 
             
             calls.append({
                 "caller": parent_id, 
                 "callee": fid, 
-                "attributes": {"direct": True, "line": random.randint(100, 900)}
+                "attributes": {"direct": True, "line": int(call_lines[i])}
             })
 
             
-            if random.random() > 0.65:
-                u_target = util_map[random.choice(UTILS)]
+            if util_pick[i]:
+                u_target = util_map[UTILS[util_targets[i]]]
                 calls.append({
                     "caller": fid, 
                     "callee": u_target, 
@@ -97,23 +111,23 @@ def generate_dataset():
                 })
 
             
-            if random.random() < CHAOS_FACTOR and len(func_ids) > 50:
+            if chaos_pick[i] and len(func_ids) > 50:
                 
-                random_target = random.choice(func_ids)
+                random_target = func_ids[int(rng.integers(0, len(func_ids)))]
                 if random_target != fid:
                     calls.append({
                         "caller": fid, 
                         "callee": random_target, 
-                        "attributes": {"direct": False, "line": random.randint(1000, 5000)}
+                        "attributes": {"direct": False, "line": int(chaos_lines[i])}
                     })
 
-            
-            create_branch(fid, current_depth + 1, prefix)
+        return child_ids
 
     
     main_id = get_hash("main")
     functions.append({"id": main_id, "name": "main", "file": "main.c", "line": 10, "params": []})
     func_ids.append(main_id)
+    func_id_set.add(main_id)
     
     
     for root_mod in ROOT_MODULES:
@@ -123,17 +137,25 @@ def generate_dataset():
         
         functions.append({"id": root_id, "name": root_name, "file": "main.c", "line": 20, "params": []})
         func_ids.append(root_id)
+        func_id_set.add(root_id)
         calls.append({"caller": main_id, "callee": root_id, "attributes": {"direct": True, "line": 25}})
         
-        # Start the recursive growth for this module
-        create_branch(root_id, 1, root_mod)
+        # Grow this module breadth-first; no recursion limit to hit
+        queue = deque([(root_id, 1)])
+        while queue:
+            parent_id, current_depth = queue.popleft()
+            if current_depth > NUM_LAYERS:
+                continue
+            children = make_children(parent_id, current_depth, root_mod)
+            queue.extend((cid, current_depth + 1) for cid in children)
 
     
     data = {"functions": functions, "calls": calls}
     output_path = "../data/final_hashed_graph.json"
     
-    with open(output_path, "w") as f:
-        json.dump(data, f, indent=2)
+    # Compact output: no indentation, serialized in one C call
+    with open(output_path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE))
         
     print(f"✅ DONE. Built {len(functions)} unique nodes and {len(calls)} connections.")
     print(f"📊 Stats: {len(functions)/len(ROOT_MODULES):.1f} nodes per module avg.")
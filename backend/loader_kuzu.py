@@ -1,16 +1,19 @@
 import kuzu
-import json
+import orjson
 import os
 import shutil
+import pyarrow as pa
 
 def build_database(json_path, db_path="callgraph_db"):
     """
-    Reads a JSON call graph and loads it into a KuzuDB database at 'db_path'.
+    Reads a JSON call graph and bulk-loads it into a KuzuDB database at 'db_path'.
     """
     print(f"🔨 Building DB at: {db_path}")
 
     
-    db = kuzu.Database(db_path)
+    # Use every core for COPY; the default buffer pool (~80% of RAM) already
+    # holds the whole graph during ingest.
+    db = kuzu.Database(db_path, max_num_threads=os.cpu_count() or 0)
     conn = kuzu.Connection(db)
 
     
@@ -29,58 +32,83 @@ def build_database(json_path, db_path="callgraph_db"):
         print(f"⚠️ Schema warning: {e}")
 
     
+    # Release the write handle on every exit, including a failed ingest, so
+    # readers can open the DB straight away and no transaction is left open
     try:
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print(f"❌ Error: Could not find file at {json_path}")
-        return
+        try:
+            with open(json_path, 'rb') as f:
+                data = orjson.loads(f.read())
+        except FileNotFoundError:
+            print(f"❌ Error: Could not find file at {json_path}")
+            return
 
-    print(f"   📄 Found {len(data['functions'])} functions and {len(data['calls'])} calls.")
+        print(f"   📄 Found {len(data['functions'])} functions and {len(data['calls'])} calls.")
 
-    
-    print("   ... Inserting Functions")
-    for func in data['functions']:
-        
-        params_str = ", ".join(func.get('params', []))
-        
-        
-        safe_name = func['name'].replace("'", "")
-        safe_file = func['file'].replace("'", "")
+        # Build the node table column-by-column. COPY rejects duplicate primary
+        # keys, so keep the first occurrence of each id.
+        print("   ... Inserting Functions")
+        ids, names, files, lines, params = [], [], [], [], []
+        seen_ids = set()
+        for func in data['functions']:
+            if func['id'] in seen_ids:
+                continue
+            seen_ids.add(func['id'])
+            ids.append(func['id'])
+            names.append(func['name'])
+            files.append(func['file'])
+            lines.append(func['line'])
+            params.append(", ".join(func.get('params', [])))
 
-        query = f"""
-        CREATE (:Function {{
-            id: '{func['id']}', 
-            name: '{safe_name}', 
-            file: '{safe_file}', 
-            line: {func['line']},
-            params: '{params_str}'
-        }})
-        """
+        func_tbl = pa.table({
+            "id": pa.array(ids, pa.string()),
+            "name": pa.array(names, pa.string()),
+            "file": pa.array(files, pa.string()),
+            "line": pa.array(lines, pa.int64()),
+            "params": pa.array(params, pa.string()),
+        })
+        # Both COPYs commit together: one WAL flush for the whole ingest, and a
+        # failed edge load leaves no half-populated Function table behind.
+        conn.execute("BEGIN TRANSACTION")
         try:
-            conn.execute(query)
-        except Exception as e:
-            
-            pass
+            conn.execute("COPY Function FROM $tbl", {"tbl": func_tbl})
 
-    
-    print("   ... Inserting Calls")
-    for call in data['calls']:
-        caller = call['caller']
-        callee = call['callee']
-        line = call['attributes'].get('line', 0)
-        
-        direct = str(call['attributes'].get('direct', True)).lower()
+            # The first two columns of a rel table COPY are the FROM/TO primary keys.
+            # Calls to unknown functions are dropped, as the old MATCH-based insert did,
+            # and repeated (caller, callee) pairs are stored once with the first
+            # occurrence's attributes.
+            print("   ... Inserting Calls")
+            callers, callees, call_lines, directs = [], [], [], []
+            seen_calls = set()
+            for call in data['calls']:
+                if call['caller'] not in seen_ids or call['callee'] not in seen_ids:
+                    continue
+                pair = (call['caller'], call['callee'])
+                if pair in seen_calls:
+                    continue
+                seen_calls.add(pair)
+                callers.append(call['caller'])
+                callees.append(call['callee'])
+                call_lines.append(call['attributes'].get('line', 0))
+                directs.append(bool(call['attributes'].get('direct', True)))
 
-        query = f"""
-        MATCH (a:Function), (b:Function)
-        WHERE a.id = '{caller}' AND b.id = '{callee}'
-        CREATE (a)-[:Calls {{line: {line}, direct: {direct}}}]->(b)
-        """
-        try:
-            conn.execute(query)
-        except Exception as e:
-            pass
+            calls_tbl = pa.table({
+                "from": pa.array(callers, pa.string()),
+                "to": pa.array(callees, pa.string()),
+                "line": pa.array(call_lines, pa.int64()),
+                "direct": pa.array(directs, pa.bool_()),
+            })
+            conn.execute("COPY Calls FROM $tbl", {"tbl": calls_tbl})
+            conn.execute("COMMIT")
+        except Exception:
+            try:
+                conn.execute("ROLLBACK")
+            except RuntimeError:
+                # A failed statement already rolled the transaction back
+                pass
+            raise
+    finally:
+        conn.close()
+        db.close()
 
     print(f"✅ Database built successfully at: {db_path}")
 
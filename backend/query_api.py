@@ -2,30 +2,64 @@ import kuzu
 
 class GraphQuery:
     def __init__(self, db_path="../callgraph_db"):
-        self.db = kuzu.Database(db_path)
+        # The UI never writes, so skip write-ahead logging and the write lock
+        self.db = kuzu.Database(db_path, read_only=True)
         self.conn = kuzu.Connection(self.db)
+        # Parsed and planned once; every search only binds $name.
+        # Kuzu has no secondary index on string properties, so every mode scans
+        # Function.name; STARTS WITH just stops comparing at the first mismatch.
+        self.search_stmts = {
+            mode: self.conn.prepare(
+                f"MATCH (f:Function) WHERE f.name {op} $name "
+                "RETURN f.id AS id, f.name AS name, f.file AS file, f.line AS line "
+                "ORDER BY size(f.name), f.name, f.id LIMIT $limit"
+            )
+            for mode, op in (("prefix", "STARTS WITH"), ("contains", "CONTAINS"), ("exact", "="))
+        }
+        # Call-tree statements keyed on query text; the depth is baked into the
+        # pattern, so each depth the UI asks for is planned once per connection.
+        self._prepared = {}
 
-    def search_function(self, name_pattern):
+    def close(self):
+        """
+        Releases the connection and the database's buffer pool and file handles.
+        """
+        self.conn.close()
+        self.db.close()
+
+    def search_function(self, name_pattern, mode="prefix", limit=50):
         """
         Finds a function ID by name using a WHERE clause.
+        mode is 'prefix' (STARTS WITH), 'contains' (substring match) or 'exact'.
+        Matches come shortest name first, so an exact match is never cut off by
+        'limit'; ties are broken by name and id to keep the order stable.
+        Returns a DataFrame with columns id, name, file, line.
         """
-        query = "MATCH (f:Function) WHERE f.name CONTAINS $name RETURN f.id, f.name, f.file, f.line"
-        return self.conn.execute(query, {"name": name_pattern})
+        params = {"name": name_pattern, "limit": int(limit)}
+        return self.conn.execute(self.search_stmts[mode], params).get_as_df()
 
     def get_call_tree(self, root_id, depth=2):
         """
         Finds the hierarchical chain of calls:
         Root -> Parent -> Child
         This preserves the structure (A calls B, B calls C).
+        Returns a DataFrame with columns parent, child.
         """
         # This query finds the root, hops 0..depth times to find a 'parent',
         # and then finds who that 'parent' calls ('child').
+        # Collapsing the parents first keeps the result at one row per edge
+        # instead of one row per path through the tree.
         query = f"""
-        MATCH (root:Function)-[:Calls*0..{depth}]->(parent:Function)-[:Calls]->(child:Function)
+        MATCH (root:Function)-[:Calls*0..{int(depth)}]->(parent:Function)
         WHERE root.id = $root_id
-        RETURN parent.name, child.name
+        WITH DISTINCT parent
+        MATCH (parent)-[:Calls]->(child:Function)
+        RETURN DISTINCT parent.name AS parent, child.name AS child
         """
-        return self.conn.execute(query, {"root_id": root_id})
+        stmt = self._prepared.get(query)
+        if stmt is None:
+            stmt = self._prepared[query] = self.conn.prepare(query)
+        return self.conn.execute(stmt, {"root_id": root_id}).get_as_df()
 
 
 if __name__ == "__main__":
@@ -34,18 +68,16 @@ if __name__ == "__main__":
     
     # 1. Test Search
     print("\n--- Searching for 'task' ---")
-    results = api.search_function("task")
-    while results.has_next():
-        print(results.get_next())
+    results = api.search_function("task", mode="contains")
+    print(results)
 
     # 2. Test Call Tree 
     
     main_results = api.search_function("main")
-    if main_results.has_next():
-        main_id = main_results.get_next()[0] # Get the ID of main
+    if not main_results.empty:
+        main_id = main_results["id"].iloc[0] # Get the ID of main
         print(f"\n--- Getting Call Tree for main (ID: {main_id}) ---")
         
         tree_results = api.get_call_tree(main_id, depth=2)
-        while tree_results.has_next():
-            row = tree_results.get_next()
-            print(f"{row[0]} calls -> {row[2]}")
\ No newline at end of file
+        for parent, child in zip(tree_results["parent"], tree_results["child"]):
+            print(f"{parent} calls -> {child}")
\ No newline at end of file
@@ -1,11 +1,23 @@
 import os
+import glob
+import atexit
 import shutil
 import uuid
 import tempfile
 import streamlit as st
 from backend.loader_kuzu import build_database
 
+# Per-session DBs are throwaway, so keep them in RAM when tmpfs is available
+SHM_DIR = "/dev/shm"
+
+# A built DB runs ~1.5x the JSON size and the WAL holds a copy during ingest,
+# so only use tmpfs when it has this many times the upload free
+SHM_HEADROOM = 3
+
+
 class SessionManager:
+    _cleanup_registered = set()
+
     @staticmethod
     def get_session_id():
         """Generates a unique ID for the user's browser tab."""
@@ -19,22 +31,52 @@ class SessionManager:
         session_id = SessionManager.get_session_id()
         
         
-        temp_dir = tempfile.gettempdir()
-        db_path = os.path.join(temp_dir, f"kuzu_session_{session_id}")
+        data = uploaded_file.getbuffer()
+        base_dir = tempfile.gettempdir()
+        # tmpfs is often small (64 MB by default in Docker), and running out
+        # mid-build fails the upload where disk would have worked
+        if os.path.isdir(SHM_DIR) and shutil.disk_usage(SHM_DIR).free > SHM_HEADROOM * len(data):
+            base_dir = SHM_DIR
+        # A fresh path per upload means results cached for the previous file
+        # are never served for this one, with no need to clear shared caches
+        build = st.session_state.get("db_build", 0) + 1
+        st.session_state["db_build"] = build
+        db_path = os.path.join(base_dir, f"kuzu_session_{session_id}_{build}")
         
         
         with tempfile.NamedTemporaryFile(delete=False, suffix=".json") as tmp_json:
-            tmp_json.write(uploaded_file.getbuffer())
+            tmp_json.write(data)
             json_path = tmp_json.name
             
         
-        if os.path.exists(db_path):
-            shutil.rmtree(db_path, ignore_errors=True)
+        SessionManager.cleanup_user_db(db_path)
+        if db_path not in SessionManager._cleanup_registered:
+            atexit.register(SessionManager.cleanup_user_db, db_path)
+            SessionManager._cleanup_registered.add(db_path)
             
         
-        build_database(json_path, db_path)
+        # A failed ingest raises; drop the half-built DB so it does not sit in
+        # tmpfs until exit, and remove the uploaded copy either way
+        try:
+            build_database(json_path, db_path)
+        except Exception:
+            SessionManager.cleanup_user_db(db_path)
+            raise
+        finally:
+            os.remove(json_path)
         
-        
-        os.remove(json_path)
-        
-        return db_path
\ No newline at end of file
+        return db_path
+
+    @staticmethod
+    def cleanup_user_db(db_path):
+        """Deletes a session database along with its WAL/sidecar files."""
+        # Match the sidecars by their dot suffix so build _1 never sweeps up _10
+        pattern = glob.escape(db_path)
+        for path in glob.glob(pattern) + glob.glob(pattern + ".*"):
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
\ No newline at end of file